@@ -1,18 +1,36 @@
 import os
-from pathlib import Path
+import shelve
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Event, Lock
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
 import urllib.parse
 from slack_sdk import WebClient
+from slack_sdk.socket_mode import SocketModeClient
+from slack_sdk.socket_mode.request import SocketModeRequest
+from slack_sdk.socket_mode.response import SocketModeResponse
 
 slack_bot_token = os.getenv('SLACK_BOT_TOKEN')
+slack_app_token = os.getenv('SLACK_APP_TOKEN')
 general_channel = os.getenv('GENERAL_CHANNEL')
 our_channel = os.getenv('OUR_CHANNEL')
 slack_client_id = os.getenv('SLACK_CLIENT_ID')
 
 client = WebClient(token=slack_bot_token)
 
+# Session partagée avec keep-alive: évite un handshake TLS par requête
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.3),
+))
+
 redirect_url = f"https://slack.com/oauth/v2/authorize?scope=chat:write:bot&client_id={slack_client_id}"
 
 
@@ -21,113 +39,190 @@ def send_message(message):
     return response
 
 
+def _upload_one(p):
+    r = client.files_getUploadURLExternal(filename=p.name, length=p.stat().st_size)
+    upload_url = r["upload_url"]
+    file_id = r["file_id"]
+
+    with p.open("rb") as f:
+        _session.post(upload_url, files={"file": (p.name, f)})
+
+    return {"id": file_id, "title": p.name}
+
+
 def upload_images(images_dir_path='images'):
     images_dir = Path('.') / images_dir_path
-    
-    for p in images_dir.iterdir():
-        r = client.files_getUploadURLExternal(filename=p.name, length=p.stat().st_size)
-        upload_url = r["upload_url"]
-        file_id = r["file_id"]
 
-        with p.open("rb") as f:
-            requests.post(upload_url, files={"file": (p.name, f)})
+    # Les uploads sont I/O-bound: on recouvre les RTTs avec un pool de threads
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        files = list(executor.map(_upload_one, images_dir.iterdir()))
 
+    # L'API accepte plusieurs fichiers: une seule finalisation pour le lot
+    if files:
         client.files_completeUploadExternal(
             channel_id=our_channel,
-            files=[{"id": file_id, "title": p.name}],
+            files=files,
         )
 
 
-def get_wikipedia_first_paragraph(title):
+# Cache des résumés Wikipedia: mémoire pour les hits chauds, shelve pour
+# survivre aux redémarrages, TTL sur les échecs pour retenter plus tard
+_WIKI_CACHE_PATH = str(Path(__file__).parent / 'wiki_cache')
+_WIKI_NEGATIVE_TTL = 3600
+_WIKI_MEMORY_MAX = 1024
+_wiki_memory = OrderedDict()
+_wiki_failures = OrderedDict()
+_wiki_lock = Lock()
+
+
+def _lru_put(cache, key, value):
+    # Même éviction bornée que le dédup des messages: les caches mémoire
+    # ne doivent pas grossir sans limite sur un bot qui tourne longtemps
+    cache[key] = value
+    if len(cache) > _WIKI_MEMORY_MAX:
+        cache.popitem(last=False)
+
+
+def _fetch_wikipedia_lang(title, lang):
     url_title = title.replace(' ', '_')
     encoded_title = urllib.parse.quote(url_title, safe='')
     headers = {'User-Agent': 'SlackBot/1.0 (https://slack.com; contact@example.com)'}
-    
-    for lang in ['fr', 'en']:
-        try:
-            url = f"https://{lang}.wikipedia.org/api/rest_v1/page/summary/{encoded_title}"
-            response = requests.get(url, headers=headers, timeout=5)
-            
-            if response.status_code == 404:
-                continue
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            if 'extract' in data and data['extract']:
-                extract = data['extract']
-                first_paragraph = extract.split('\n')[0]
-                if len(first_paragraph) > 500:
-                    sentences = first_paragraph.split('. ')
-                    if len(sentences) > 0:
-                        return sentences[0] + '.'
-                return first_paragraph
-            elif 'description' in data and data['description']:
-                return data['description']
-        except requests.exceptions.Timeout:
-            if lang == 'en':
-                print(f"Timeout pour: {title}")
-            continue
-        except requests.exceptions.RequestException as e:
-            if lang == 'en':
-                print(f"Erreur: {e}")
-            continue
-        except Exception as e:
-            if lang == 'en':
-                print(f"Erreur inattendue: {e}")
-            continue
-    
+
+    try:
+        url = f"https://{lang}.wikipedia.org/api/rest_v1/page/summary/{encoded_title}"
+        response = _session.get(url, headers=headers, timeout=5)
+
+        if response.status_code == 404:
+            return None
+
+        response.raise_for_status()
+        data = response.json()
+
+        if 'extract' in data and data['extract']:
+            extract = data['extract']
+            first_paragraph = extract.split('\n')[0]
+            if len(first_paragraph) > 500:
+                sentences = first_paragraph.split('. ')
+                if len(sentences) > 0:
+                    return sentences[0] + '.'
+            return first_paragraph
+        elif 'description' in data and data['description']:
+            return data['description']
+    except requests.exceptions.Timeout:
+        if lang == 'en':
+            print(f"Timeout pour: {title}")
+    except requests.exceptions.RequestException as e:
+        if lang == 'en':
+            print(f"Erreur: {e}")
+    except Exception as e:
+        if lang == 'en':
+            print(f"Erreur inattendue: {e}")
+
     return None
 
 
+def _fetch_wikipedia_summary(title):
+    # fr et en en parallèle, priorité au fr: divise la latence par deux
+    # quand le wiki français n'a pas l'article
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        fr_result, en_result = pool.map(
+            lambda lang: _fetch_wikipedia_lang(title, lang), ['fr', 'en']
+        )
+    return fr_result or en_result
+
+
+def get_wikipedia_first_paragraph(title):
+    normalized = ' '.join(title.split()).lower()
+
+    cached = _wiki_memory.get(normalized)
+    if cached is not None:
+        return cached
+
+    failed_at = _wiki_failures.get(normalized)
+    if failed_at is not None and time.time() - failed_at < _WIKI_NEGATIVE_TTL:
+        return None
+
+    with _wiki_lock:
+        with shelve.open(_WIKI_CACHE_PATH) as cache:
+            if normalized in cache:
+                paragraph = cache[normalized]
+                _lru_put(_wiki_memory, normalized, paragraph)
+                return paragraph
+
+    paragraph = _fetch_wikipedia_summary(title)
+
+    if paragraph:
+        _lru_put(_wiki_memory, normalized, paragraph)
+        with _wiki_lock:
+            with shelve.open(_WIKI_CACHE_PATH) as cache:
+                cache[normalized] = paragraph
+        _wiki_failures.pop(normalized, None)
+    else:
+        _lru_put(_wiki_failures, normalized, time.time())
+
+    return paragraph
+
+
+# Les requêtes Wikipedia sont bloquantes: on les sort de la boucle socket
+_wiki_pool = ThreadPoolExecutor(max_workers=4)
+
+
+def _answer_wikipedia(title):
+    paragraph = get_wikipedia_first_paragraph(title)
+
+    if paragraph:
+        client.chat_postMessage(
+            channel=our_channel,
+            text=f"*{title}*\n\n{paragraph}"
+        )
+        print(f"good pour: {title}")
+    else:
+        client.chat_postMessage(
+            channel=our_channel,
+            text=f"ça marche pas pour '{title}' :("
+        )
+        print(f"Erreur pour {title}")
+
+
+def _on_socket_request(socket_client, req: SocketModeRequest):
+    # Ack tout de suite, sinon Slack redélivre l'événement
+    socket_client.send_socket_mode_response(
+        SocketModeResponse(envelope_id=req.envelope_id)
+    )
+
+    if req.type != 'events_api':
+        return
+
+    event = req.payload.get('event', {})
+    if event.get('type') != 'message' or event.get('bot_id') or event.get('subtype'):
+        return
+
+    # Même périmètre que l'ancien polling: on ne répond qu'à notre canal
+    if event.get('channel') != our_channel:
+        return
+
+    text = event.get('text', '')
+    match = re.match(r'^Wikipedia:\s*(.+)$', text, re.IGNORECASE)
+
+    if match:
+        title = match.group(1).strip()
+        print(f"Message trouvé: Wikipedia:{title}")
+        _wiki_pool.submit(_answer_wikipedia, title)
+
+
 def listen_and_respond():
-    processed_messages = set()
-    bot_user_id = client.auth_test().get('user_id', '')
-    
+    # Socket Mode pousse les messages en temps réel: plus de polling
+    # conversations_history toutes les 2s, plus de dédup à gérer
+    socket_client = SocketModeClient(app_token=slack_app_token, web_client=client)
+    socket_client.socket_mode_request_listeners.append(_on_socket_request)
+    socket_client.connect()
+
     print("start")
-    
-    while True:
-        try:
-            result = client.conversations_history(channel=our_channel, limit=10)
-            
-            if result["ok"]:
-                for message in result["messages"]:
-                    if 'bot_id' in message or message.get('user') == bot_user_id:
-                        continue
-                    
-                    text = message.get('text', '')
-                    match = re.match(r'^Wikipedia:\s*(.+)$', text, re.IGNORECASE)
-                    
-                    if match:
-                        message_id = f"{message.get('ts', '')}:{text}"
-                        
-                        if message_id not in processed_messages:
-                            processed_messages.add(message_id)
-                            title = match.group(1).strip()
-                            print(f"Message trouvé: Wikipedia:{title}")
-                            
-                            paragraph = get_wikipedia_first_paragraph(title)
-                            
-                            if paragraph:
-                                client.chat_postMessage(
-                                    channel=our_channel,
-                                    text=f"*{title}*\n\n{paragraph}"
-                                )
-                                print(f"good pour: {title}")
-                            else:
-                                client.chat_postMessage(
-                                    channel=our_channel,
-                                    text=f"ça marche pas pour '{title}' :("
-                                )
-                                print(f"Erreur pour {title}")
-            
-            time.sleep(2)
-            
-        except KeyboardInterrupt:
-            break
-        except Exception as e:
-            print(f"Erreur {e}")
-            time.sleep(5)
+
+    try:
+        Event().wait()
+    except KeyboardInterrupt:
+        socket_client.close()
 
 
 if __name__ == "__main__":
@@ -1,125 +1,204 @@
-import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict
-import time
+import asyncio
 import json
+from urllib.parse import urljoin
 
+import aiohttp
+from selectolax.lexbor import LexborHTMLParser
+from typing import Dict, List, Optional, Tuple
 
-def scrape_quotes_from_page(url: str) -> tuple[List[Dict], str]:
+
+def parse_quotes_page(html: str, url: str) -> Tuple[List[Dict], Optional[str]]:
     """
-    Scrape toutes les citations d'une page
-    
+    Parse toutes les citations d'une page déjà téléchargée
+
     Args:
-        url: URL de la page à scraper
-        
+        html: Contenu HTML de la page
+        url: URL de la page (pour résoudre le lien suivant)
+
     Returns:
         Tuple contenant:
         - Liste de dictionnaires avec les citations (texte, auteur, tags)
-        - URL de la page suivante 
+        - URL de la page suivante
     """
+    tree = LexborHTMLParser(html)
+    quotes = []
+
+    for quote_element in tree.css('div.quote'):
+        quote_data = {
+            'text': None,
+            'author': None,
+            'tags': []
+        }
+
+        text_element = quote_element.css_first('span.text')
+        if text_element:
+            quote_data['text'] = text_element.text(strip=True)
+
+        author_element = quote_element.css_first('small.author')
+        if author_element:
+            quote_data['author'] = author_element.text(strip=True)
+
+        quote_data['tags'] = [tag.text(strip=True) for tag in quote_element.css('div.tags a.tag')]
+
+        if quote_data['text']:
+            quotes.append(quote_data)
+
+    next_link = None
+    next_anchor = tree.css_first('li.next a')
+    if next_anchor:
+        next_href = next_anchor.attributes.get('href')
+        if next_href:
+            # urljoin gère les hrefs absolus comme relatifs
+            next_link = urljoin(url, next_href)
+
+    return quotes, next_link
+
+
+# Cache ETag sur disque: les pages inchangées répondent 304 sans corps,
+# on ne retélécharge ni ne reparse que ce qui a changé entre deux runs
+_ETAG_CACHE_FILE = 'page_etags.json'
+
+
+def _load_etag_cache() -> Dict:
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        quotes = []
-        
-        quote_elements = soup.find_all('div', class_='quote')
-        
-        for quote_element in quote_elements:
-            quote_data = {
-                'text': None,
-                'author': None,
-                'tags': []
-            }
-            
-            text_element = quote_element.find('span', class_='text')
-            if text_element:
-                quote_data['text'] = text_element.get_text(strip=True)
-            
-            author_element = quote_element.find('small', class_='author')
-            if author_element:
-                quote_data['author'] = author_element.get_text(strip=True)
-            
-            tags_container = quote_element.find('div', class_='tags')
-            if tags_container:
-                tag_elements = tags_container.find_all('a', class_='tag')
-                quote_data['tags'] = [tag.get_text(strip=True) for tag in tag_elements]
-            
-            if quote_data['text']:
-                quotes.append(quote_data)
-        
-        next_link = None
-        next_element = soup.find('li', class_='next')
-        if next_element:
-            next_anchor = next_element.find('a')
-            if next_anchor and next_anchor.get('href'):
-                next_href = next_anchor.get('href')
-                if next_href.startswith('/'):
-                    base_url = '/'.join(url.split('/')[:3])
-                    next_link = base_url + next_href
-                else:
-                    next_link = next_href
-        
-        return quotes, next_link
-        
-    except requests.RequestException as e:
-        print(f"Erreur lors de la requête à {url}: {str(e)}")
-        return [], None
-    except Exception as e:
-        print(f"Erreur lors du parsing de {url}: {str(e)}")
-        return [], None
+        with open(_ETAG_CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
 
 
-def crawl_all_quotes(start_url: str) -> List[Dict]:
+def _save_etag_cache(cache: Dict):
+    with open(_ETAG_CACHE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
+
+
+async def fetch_page(session: aiohttp.ClientSession, url: str,
+                     semaphore: asyncio.Semaphore,
+                     etag: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Télécharge une page en respectant la limite de requêtes simultanées
+
+    Returns:
+        Tuple (corps ou None si 304 inchangé, ETag de la réponse)
     """
-    Crawl toutes les pages du site en suivant automatiquement la pagination
-    
+    headers = {'If-None-Match': etag} if etag else {}
+    async with semaphore:
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=10),
+                               headers=headers) as response:
+            if response.status == 304:
+                return None, etag
+            response.raise_for_status()
+            return await response.text(), response.headers.get('ETag')
+
+
+async def crawl_all_quotes_async(start_url: str, concurrency: int = 8,
+                                 batch_size: int = 10) -> List[Dict]:
+    """
+    Crawl toutes les pages du site en parallèle
+
+    La pagination est prévisible (/page/N/), donc on télécharge les pages
+    par lots avec asyncio.gather au lieu d'attendre chaque lien "next".
+    Le sémaphore limite le nombre de connexions simultanées vers l'hôte.
+
     Args:
         start_url: URL de départ (première page)
-        
+        concurrency: Nombre maximum de requêtes simultanées
+        batch_size: Nombre de pages téléchargées par lot
+
     Returns:
         Liste de tous les dictionnaires de citations trouvées
     """
     all_quotes = []
-    current_url = start_url
-    page_count = 0
-    
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit_per_host=concurrency)
+    loop = asyncio.get_running_loop()
+    etag_cache = _load_etag_cache()
+    page = 1
+    done = False
+
     print(f"Démarrage du crawl à partir de: {start_url}")
-    
-    while current_url:
-        page_count += 1
-        print(f"Scraping page {page_count}: {current_url}")
-        
-        quotes, next_url = scrape_quotes_from_page(current_url)
-        
-        if quotes:
-            all_quotes.extend(quotes)
-            print(f"  → {len(quotes)} citations trouvées sur cette page")
-        else:
-            print(f"  → Aucune citation trouvée sur cette page")
-        
-        current_url = next_url
-        
-        if current_url:
-            time.sleep(0.5)
-    
-    print(f"\nCrawl terminé! Total: {len(all_quotes)} citations sur {page_count} pages")
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        while not done:
+            urls = [f"{start_url.rstrip('/')}/page/{n}/"
+                    for n in range(page, page + batch_size)]
+            results = await asyncio.gather(
+                *[fetch_page(session, url, semaphore,
+                             etag_cache.get(url, {}).get('etag'))
+                  for url in urls],
+                return_exceptions=True
+            )
+
+            for url, result in zip(urls, results):
+                if isinstance(result, Exception):
+                    print(f"Erreur lors de la requête à {url}: {result}")
+                    done = True
+                    break
+
+                body, etag = result
+
+                if body is None:
+                    # 304: la page n'a pas changé, on reprend le cache
+                    cached = etag_cache[url]
+                    quotes, next_url = cached['quotes'], cached['next']
+                    print(f"  → {len(quotes)} citations (cache, 304) sur {url}")
+                else:
+                    # Le parsing est CPU-bound, on le sort de la boucle d'événements
+                    quotes, next_url = await loop.run_in_executor(
+                        None, parse_quotes_page, body, url
+                    )
+                    if etag:
+                        etag_cache[url] = {
+                            'etag': etag,
+                            'quotes': quotes,
+                            'next': next_url,
+                        }
+                    if quotes:
+                        print(f"  → {len(quotes)} citations trouvées sur {url}")
+
+                if quotes:
+                    all_quotes.extend(quotes)
+                else:
+                    done = True
+                    break
+
+                if next_url is None:
+                    done = True
+                    break
+
+            page += batch_size
+
+    _save_etag_cache(etag_cache)
+
+    print(f"\nCrawl terminé! Total: {len(all_quotes)} citations")
     return all_quotes
 
 
+def crawl_all_quotes(start_url: str) -> List[Dict]:
+    """
+    Point d'entrée synchrone du crawler
+
+    Args:
+        start_url: URL de départ (première page)
+
+    Returns:
+        Liste de tous les dictionnaires de citations trouvées
+    """
+    return asyncio.run(crawl_all_quotes_async(start_url))
+
+
 if __name__ == '__main__':
     base_url = 'https://quotes.toscrape.com/'
     output_file = 'quotes.json'
-    
+
     all_quotes = crawl_all_quotes(base_url)
-    
+
     if all_quotes:
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(all_quotes, f, indent=2, ensure_ascii=False)
-        
+
         print(f"\n✓ {len(all_quotes)} citations sauvegardées dans '{output_file}'")
-        
+
         print("\n" + "="*60)
         print("Exemple :")
         print("="*60)
@@ -130,4 +209,3 @@ if __name__ == '__main__':
         print("="*60)
     else:
         print("Aucune citation extraite wtf")
-
@@ -1,10 +1,50 @@
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+import itertools
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Optional
 import unicodedata
 
 
+# Regex compilées une seule fois à l'import: évite de reconstruire les
+# patterns à chaque appel
+_PAT_WS = re.compile(r'\s+')
+
+# Table de suppression des emojis pour str.translate: lookup C par
+# codepoint, bien plus rapide que la grosse classe de caractères regex
+_EMOJI_TRANS = dict.fromkeys(itertools.chain(
+    range(0x1F600, 0x1F650),
+    range(0x1F300, 0x1F600),
+    range(0x1F680, 0x1F700),
+    range(0x1F1E0, 0x1F200),
+    range(0x2702, 0x27B1),
+    range(0x24C2, 0x1F252),
+), None)
+_PAT_FILENAME = re.compile(r'(\w+)_(\d+)_(\w+)_(\d+)_(\d+)_(\d+)_(\d+)_\.html')
+# Une ligne d'adresse est soit 'code postal [+ ville]' soit une ville seule.
+# Le code postal matche n'importe où dans la ligne ('75011 PARIS CEDEX 09'
+# compris); la ville en suffixe n'est capturée que si elle va jusqu'au bout
+_PAT_ADDR_LINE = re.compile(r'(\d{5})(?:\s*([A-Za-zÀ-ÿ\s\-]+)$)?|^([A-Za-zÀ-ÿ\s\-]+)$')
+_PAT_ORDER_NUM = re.compile(r'Commande n[°\s]+(\d+)', re.IGNORECASE)
+_PAT_ORDER_NUM_ALT = re.compile(r'num[ée]ro de commande.*?est[:\s]+(\d+)', re.IGNORECASE)
+_PAT_ORDER_PHRASE = re.compile(r'num[ée]ro de commande', re.IGNORECASE)
+_PAT_QTY = re.compile(r'^(\d+)x$')
+_PAT_PRICE = re.compile(r'€?\s*([\d,\.]+)')
+
+# Styles inline utilisés comme sélecteurs dans les reçus Deliveroo
+_STYLE_BOLD = re.compile(r'font-weight:bolder')
+_STYLE_GREY = re.compile(r'color:#828585')
+_STYLE_BLACK = re.compile(r'color:#000001')
+_STYLE_RIGHT = re.compile(r'text-align:right')
+
+# Les extracteurs ne consultent que ces éléments: restreindre la
+# construction de l'arbre à ceux-ci évite de matérialiser des noeuds
+# Python pour tout le boilerplate du mail
+_RECEIPT_STRAINER = SoupStrainer(['table', 'h2', 'p'])
+
+
 def clean_text(text: str, remove_emojis: bool = False) -> str:
     """
     Nettoyer le texte en gérant émoji et symboles chelous
@@ -21,24 +61,16 @@ def clean_text(text: str, remove_emojis: bool = False) -> str:
     
     try:
 
-        text = unicodedata.normalize('NFC', text)
-        
+        # NFC est un no-op sur l'ASCII pur
+        if not text.isascii():
+            text = unicodedata.normalize('NFC', text)
+
         if remove_emojis:
             # Supprimer les emojis et symboles chelous
-            emoji_pattern = re.compile(
-                "["
-                "\U0001F600-\U0001F64F" 
-                "\U0001F300-\U0001F5FF"
-                "\U0001F680-\U0001F6FF" 
-                "\U0001F1E0-\U0001F1FF" 
-                "\U00002702-\U000027B0"  
-                "\U000024C2-\U0001F251"  
-                "]+", flags=re.UNICODE
-            )
-            text = emoji_pattern.sub('', text)
-        
+            text = text.translate(_EMOJI_TRANS)
+
 
-        text = re.sub(r'\s+', ' ', text)
+        text = _PAT_WS.sub(' ', text)
         
         # Suppr espaces 
         text = text.strip()
@@ -50,55 +82,101 @@ def clean_text(text: str, remove_emojis: bool = False) -> str:
         try:
 
             text = text.encode('utf-8', errors='ignore').decode('utf-8', errors='ignore')
-            text = re.sub(r'\s+', ' ', text).strip()
+            text = _PAT_WS.sub(' ', text).strip()
             return text
         except Exception:
 
             return ""
 
 
-def parse_deliveroo_html(html_file_path: str) -> Dict:
+def _clean_fast(node) -> str:
     """
-    Parse un fichier et fait l'extract 
-    
+    Extrait et normalise le texte d'un élément en une seule passe
+
+    get_text(' ', strip=True) effondre les blancs entre noeuds, mais pas
+    les retours à la ligne internes du HTML de mail: on garde un passage
+    \\s+ -> ' ' (quasi gratuit sur une chaîne déjà propre), puis la
+    normalisation NFC (sautée pour l'ASCII pur). clean_text reste pour
+    les chaînes brutes (noms de fichiers, etc.)
+    """
+    text = _PAT_WS.sub(' ', node.get_text(' ', strip=True))
+    if text.isascii():
+        return text
+    return unicodedata.normalize('NFC', text)
+
+
+def read_html(html_file_path: str) -> bytes:
+    """
+    Lit un fichier HTML en bytes bruts (libxml2 détecte l'encodage)
+
+    os.open/os.read court-circuitent les couches de l'I/O bufferisée:
+    un seul read de la taille exacte du fichier, sans objet fichier
+    ni buffer intermédiaire.
+    """
+    fd = os.open(html_file_path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        data = os.read(fd, size)
+        # read peut rendre moins que demandé, on complète si besoin
+        while len(data) < size:
+            chunk = os.read(fd, size - len(data))
+            if not chunk:
+                break
+            data += chunk
+        return data
+    finally:
+        os.close(fd)
+
+
+def parse_order_html(html_content: bytes, filename: str) -> Dict:
+    """
+    Parse le contenu HTML déjà en mémoire d'un reçu
+
+    Séparer la lecture du parsing permet de précharger les fichiers
+    pendant que le parseur travaille sur le précédent.
+
     Args:
-        html_file_path: Chemin vers le fichier HTML
-        
+        html_content: Contenu HTML brut du reçu
+        filename: Nom du fichier (pour en extraire la date)
+
     Returns:
         Dictionnaire contenant toutes les infos parsées
     """
-    try:
-        with open(html_file_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-    except UnicodeDecodeError:
-
-        with open(html_file_path, 'r', encoding='latin-1') as f:
-            html_content = f.read()
-            html_content = html_content.encode('latin-1').decode('utf-8', errors='ignore')
-    
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
+    soup = BeautifulSoup(html_content, 'lxml', parse_only=_RECEIPT_STRAINER)
 
-    filename = html_file_path.split('/')[-1]
     date_info = extract_date_from_filename(filename)
-    
+
+    restaurant_info, client_info = _extract_parties(soup)
+
     return {
         'date': date_info,
-        'restaurant': extract_restaurant_info(soup),
-        'client': extract_client_info(soup),
+        'restaurant': restaurant_info,
+        'client': client_info,
         'commande': extract_order_info(soup),
         'articles': extract_items(soup),
         'totaux': extract_totals(soup)
     }
 
 
+def parse_deliveroo_html(html_file_path: str) -> Dict:
+    """
+    Parse un fichier et fait l'extract
+
+    Args:
+        html_file_path: Chemin vers le fichier HTML
+
+    Returns:
+        Dictionnaire contenant toutes les infos parsées
+    """
+    return parse_order_html(read_html(html_file_path), html_file_path.split('/')[-1])
+
+
 def extract_date_from_filename(filename: str) -> Optional[Dict]:
     """
     Extrait la date et l'heure 
     """
 
-    pattern = r'(\w+)_(\d+)_(\w+)_(\d+)_(\d+)_(\d+)_(\d+)_\.html'
-    match = re.search(pattern, filename)
+    match = _PAT_FILENAME.search(filename)
     
     if match:
         jour_semaine, jour, mois_str, annee, heure, minute, seconde = match.groups()
@@ -144,114 +222,109 @@ def parse_address_parts(address_lines: List[str]) -> Dict:
     
     if not address_lines:
         return result
-    
 
-    if len(address_lines) > 0:
-        result['address'] = clean_text(address_lines[0])
+    result['address'] = clean_text(address_lines[0])
 
-    postal_pattern = r'(\d{5})'
-    for line in address_lines[1:]: 
-        match = re.search(postal_pattern, line)
-        if match:
-            result['postal_code'] = match.group(1)
+    # Un seul passage: chaque ligne est classée par une unique regex
+    # (code postal + ville éventuelle, ou ville seule)
+    for line in address_lines[1:]:
+        match = _PAT_ADDR_LINE.search(clean_text(line))
+        if not match:
+            continue
+
+        postal, city_after_postal, city_only = match.groups()
+
+        if postal and result['postal_code'] is None:
+            result['postal_code'] = postal
+            if city_after_postal:
+                result['city'] = city_after_postal.strip()
+        elif city_only and result['city'] is None:
+            result['city'] = city_only.strip()
 
-            city_match = re.search(r'\d{5}([A-Za-z\s]+)$', line)
-            if city_match:
-                result['city'] = city_match.group(1).strip()
+        if result['postal_code'] and result['city']:
             break
-    
-    if not result['city']:
-        for line in address_lines[1:]:  
-            cleaned_line = clean_text(line)
-            if not re.search(postal_pattern, cleaned_line):
-
-                if re.match(r'^[A-Za-z\s]+$', cleaned_line):
-                    result['city'] = cleaned_line
-                    break
-    
+
     return result
 
 
-def extract_restaurant_info(soup: BeautifulSoup) -> Dict:
+def _is_right_aligned(table) -> bool:
     """
-    Extrait les infos du restaurant
+    Vérifie si un bloc est aligné à droite (côté client du reçu)
+    sans re-sérialiser tout le sous-arbre en string
     """
-    restaurant_info = {
+    if table.get('align') == 'right':
+        return True
+    if any(tag.get('align') == 'right' for tag in table.find_all(align=True)):
+        return True
+    return any('text-align:right' in p['style'] for p in table.find_all('p', style=True))
+
+
+def _empty_party() -> Dict:
+    return {
         'nom': None,
         'address': None,
         'city': None,
         'postal_code': None,
         'telephone': None
     }
-    
-    tables = soup.find_all('table', class_='fluid')
-    for table in tables:
-        p_tags = table.find_all('p', style=re.compile(r'font-weight:bolder'))
-        if p_tags:
-            text = clean_text(p_tags[0].get_text(strip=True))
-            if text and len(text) < 100:  
-
-                if 'align="left"' in str(table) or not 'align="right"' in str(table):
-                    restaurant_info['nom'] = text
-                    address_lines = []
-                    next_ps = table.find_all('p', style=re.compile(r'color:#828585'))
-                    for p in next_ps:
-                        addr_part = clean_text(p.get_text(strip=True))
-                        if addr_part and not addr_part.startswith('+'):
-                            address_lines.append(addr_part)
-                        elif addr_part and addr_part.startswith('+'):
-                            restaurant_info['telephone'] = addr_part
-                    
-                    address_parts = parse_address_parts(address_lines)
-                    restaurant_info.update(address_parts)
-                    break
-    
-    return restaurant_info
 
 
-def extract_client_info(soup: BeautifulSoup) -> Dict:
+def _extract_parties(soup: BeautifulSoup) -> tuple[Dict, Dict]:
     """
-    Extrait les infos du client
+    Extrait les infos du restaurant et du client en un seul parcours
+
+    Les deux blocs vivent dans les mêmes tables fluid: on les classe par
+    l'alignement (droite = client) au lieu de re-parcourir l'arbre deux fois.
+
+    Returns:
+        Tuple (restaurant_info, client_info)
     """
-    client_info = {
-        'nom': None,
-        'address': None,
-        'city': None,
-        'postal_code': None,
-        'telephone': None
-    }
-    
-    tables = soup.find_all('table', class_='fluid')
-    for table in tables:
-        if 'align="right"' in str(table) or 'text-align:right' in str(table):
-            p_tags = table.find_all('p', style=re.compile(r'font-weight:bolder'))
-            if p_tags:
-                nom = clean_text(p_tags[0].get_text(strip=True))
-                if nom:
-                    client_info['nom'] = nom
-                    address_lines = []
-                    next_ps = table.find_all('p', style=re.compile(r'color:#828585'))
-                    for p in next_ps:
-                        addr_part = clean_text(p.get_text(strip=True))
-                        if addr_part and not addr_part.startswith('+'):
-                            address_lines.append(addr_part)
-                        elif addr_part and addr_part.startswith('+'):
-                            client_info['telephone'] = addr_part
-                    
-                    address_parts = parse_address_parts(address_lines)
-                    client_info.update(address_parts)
-                    break
-    
+    restaurant_info = _empty_party()
+    client_info = _empty_party()
+
+    for table in soup.find_all('table', class_='fluid'):
+        p_tags = table.find_all('p', style=_STYLE_BOLD)
+        if not p_tags:
+            continue
+
+        nom = _clean_fast(p_tags[0])
+        if not nom:
+            continue
+
+        if _is_right_aligned(table):
+            target = client_info
+        elif len(nom) < 100:
+            target = restaurant_info
+        else:
+            continue
+
+        if target['nom'] is not None:
+            continue
+
+        target['nom'] = nom
+        address_lines = []
+        for p in table.find_all('p', style=_STYLE_GREY):
+            addr_part = _clean_fast(p)
+            if addr_part and not addr_part.startswith('+'):
+                address_lines.append(addr_part)
+            elif addr_part and addr_part.startswith('+'):
+                target['telephone'] = addr_part
+
+        target.update(parse_address_parts(address_lines))
+
+        if restaurant_info['nom'] and client_info['nom']:
+            break
+
     if not client_info['nom']:
         h2_tags = soup.find_all('h2')
         for h2 in h2_tags:
-            text = clean_text(h2.get_text(strip=True))
+            text = _clean_fast(h2)
             if 'Excellent choix' in text:
                 nom = clean_text(text.replace('Excellent choix,', '').strip())
                 client_info['nom'] = nom
                 break
-    
-    return client_info
+
+    return restaurant_info, client_info
 
 
 def extract_order_info(soup: BeautifulSoup) -> Dict:
@@ -264,20 +337,20 @@ def extract_order_info(soup: BeautifulSoup) -> Dict:
     
     h2_tags = soup.find_all('h2')
     for h2 in h2_tags:
-        text = clean_text(h2.get_text(strip=True))
-        match = re.search(r'Commande n[°\s]+(\d+)', text, re.IGNORECASE)
+        text = _clean_fast(h2)
+        match = _PAT_ORDER_NUM.search(text)
         if match:
             order_info['numero'] = match.group(1)
             break
     
     if not order_info['numero']:
-        try:
-            all_text = clean_text(soup.get_text())
-            match = re.search(r'num[ée]ro de commande.*?est[:\s]+(\d+)', all_text, re.IGNORECASE)
+        # On ne regarde que les noeuds texte contenant la phrase au lieu
+        # de sérialiser tout le document avec soup.get_text()
+        for node in soup.find_all(string=_PAT_ORDER_PHRASE):
+            match = _PAT_ORDER_NUM_ALT.search(_clean_fast(node.parent))
             if match:
                 order_info['numero'] = match.group(1)
-        except Exception:
-            pass
+                break
     
     return order_info
 
@@ -296,63 +369,69 @@ def extract_items(soup: BeautifulSoup) -> List[Dict]:
     rows = list_item_table.find_all('tr')
     
     for row in rows:
+        # Les rejets pas chers d'abord: le dict item n'est construit
+        # qu'une fois la ligne validée comme un vrai article
+        cells = row.find_all('td')
+        if len(cells) < 2:
+            continue
+
+        name_cell = cells[1]
+        name_p = name_cell.find('p', style=_STYLE_BLACK)
+        if not name_p:
+            continue
+
+        nom_text = _clean_fast(name_p)
+        if not nom_text or _PAT_QTY.match(nom_text) or len(nom_text) <= 3:
+            continue
+
         item = {
             'quantite': None,
-            'nom': None,
+            'nom': nom_text,
             'options': [],
             'prix': None
         }
-        
-        cells = row.find_all('td')
-        if len(cells) < 2:
-            continue
-        
-        qty_cell = cells[0] if len(cells) > 0 else None
-        name_cell = cells[1] if len(cells) > 1 else None
-        price_cell = cells[2] if len(cells) > 2 else None
-        
-        if qty_cell:
-            qty_p = qty_cell.find('p')
-            if qty_p:
-                qty_text = clean_text(qty_p.get_text(strip=True))
-                match = re.search(r'^(\d+)x$', qty_text)
-                if match:
-                    item['quantite'] = int(match.group(1))
-        
-        if name_cell:
-            name_p = name_cell.find('p', style=re.compile(r'color:#000001'))
-            if name_p:
-                nom_text = clean_text(name_p.get_text(strip=True))
-                if nom_text and not re.match(r'^\d+x$', nom_text) and len(nom_text) > 3:
-                    item['nom'] = nom_text
-                    
-                    option_ps = name_cell.find_all('p', style=re.compile(r'color:#828585'))
-                    for p in option_ps:
-                        option_text = clean_text(p.get_text(strip=True))
-                        if option_text and option_text != item['nom'] and len(option_text) > 0:
-                            item['options'].append(option_text)
-        
-        if price_cell:
-            price_p = price_cell.find('p', style=re.compile(r'text-align:right'))
+
+        qty_p = cells[0].find('p')
+        if qty_p:
+            match = _PAT_QTY.match(_clean_fast(qty_p))
+            if match:
+                item['quantite'] = int(match.group(1))
+
+        for p in name_cell.find_all('p', style=_STYLE_GREY):
+            option_text = _clean_fast(p)
+            if option_text and option_text != nom_text:
+                item['options'].append(option_text)
+
+        if len(cells) > 2:
+            price_p = cells[2].find('p', style=_STYLE_RIGHT)
             if price_p:
-                price_text = clean_text(price_p.get_text(strip=True))
-                match = re.search(r'€?\s*([\d,\.]+)\s*[€€]?', price_text)
+                match = _PAT_PRICE.search(_clean_fast(price_p))
                 if match:
-                    price_str = match.group(1).replace(',', '.')
                     try:
-                        item['prix'] = float(price_str)
+                        item['prix'] = float(match.group(1).replace(',', '.'))
                     except ValueError:
                         pass
-        
-        if item['nom']:
-            items.append(item)
-    
+
+        items.append(item)
+
     return items
 
 
+# Libellés des lignes de totaux -> clés du dict résultat. La recherche
+# se fait par inclusion sur le texte sans espaces: les libellés décorés
+# ('Sous-total :') ou éclatés en spans ('Sous- total') matchent quand même
+_LABEL_MAP = {
+    'Sous-total': 'sous_total',
+    'Frais de livraison': 'frais_livraison',
+    'Pourboire': 'pourboire',
+    'Crédit': 'credit',
+}
+_LABEL_LOOKUP = [(label.replace(' ', ''), key) for label, key in _LABEL_MAP.items()]
+
+
 def extract_totals(soup: BeautifulSoup) -> Dict:
     """
-    Extrait les totaux 
+    Extrait les totaux en un seul passage sur les lignes du document
     """
     totals = {
         'sous_total': None,
@@ -361,57 +440,56 @@ def extract_totals(soup: BeautifulSoup) -> Dict:
         'credit': None,
         'total': None
     }
-    
-    all_trs = soup.find_all('tr')
-    
-    for tr in all_trs:
-        tds = tr.find_all('td')
-        if len(tds) >= 2:
-            label_p = tds[0].find('p')
-            price_p = tds[1].find('p')
-            
-            if label_p and price_p:
-                label_text = clean_text(label_p.get_text(strip=True))
-                price_text = clean_text(price_p.get_text(strip=True))
-                
-                price_match = re.search(r'€?\s*([\d,\.]+)', price_text)
-                if price_match:
-                    price_str = price_match.group(1).replace(',', '.')
-                    try:
-                        price_value = float(price_str)
-                        
-                        if 'Sous-total' in label_text:
-                            totals['sous_total'] = price_value
-                        elif 'Frais de livraison' in label_text:
-                            totals['frais_livraison'] = price_value
-                        elif 'Pourboire' in label_text:
-                            totals['pourboire'] = price_value
-                        elif 'Crédit' in label_text:
-                            totals['credit'] = price_value
-                        elif 'Total' in label_text and ('class="total"' in str(label_p) or 'font-size:34px' in str(label_p)):
-                            totals['total'] = price_value
-                    except ValueError:
-                        pass
-    
+
+    for tr in soup.find_all('tr'):
+        # Libellé dans la première cellule, prix dans la seconde: une
+        # cellule de libellé à plusieurs <p> ne doit pas décaler le prix
+        tds = tr.find_all('td', limit=2)
+        if len(tds) < 2:
+            continue
+        label_p = tds[0].find('p')
+        price_p = tds[1].find('p')
+        if label_p is None or price_p is None:
+            continue
+
+        price_match = _PAT_PRICE.search(_clean_fast(price_p))
+        if not price_match:
+            continue
+        try:
+            price_value = float(price_match.group(1).replace(',', '.'))
+        except ValueError:
+            continue
+
+        label_text = _clean_fast(label_p)
+        label_compact = label_text.replace(' ', '')
+        for label, key in _LABEL_LOOKUP:
+            if label in label_compact:
+                totals[key] = price_value
+                break
+        else:
+            if 'Total' in label_text and ('total' in (label_p.get('class') or []) or 'font-size:34px' in (label_p.get('style') or '')):
+                totals['total'] = price_value
+
     return totals
 
 
-def generate_order_json(html_file_path: str) -> Dict:
+def generate_order_json_from_content(html_content: bytes, filename: str) -> Dict:
     """
-    Parse un fichier HTML et génère un JSON
-    
+    Génère le JSON d'une commande depuis un contenu HTML déjà lu
+
     Args:
-        html_file_path: Chemin vers le fichier HTML
-        
+        html_content: Contenu HTML brut du reçu
+        filename: Nom du fichier (pour en extraire la date)
+
     Returns:
-        Dictionnaire JSON 
+        Dictionnaire JSON
         - Order: number, total_paid, delivery_fee, datetime
         - Order Items: name, price, quantity
         - Restaurant: name, address, city, postal_code, phone_number
         - Customer: name, address, city, postal_code, phone_number
     """
-    parsed_data = parse_deliveroo_html(html_file_path)
-    
+    parsed_data = parse_order_html(html_content, filename)
+
     json_data = {
         'Order': {
             'number': parsed_data['commande']['numero'],
@@ -445,3 +523,35 @@ def generate_order_json(html_file_path: str) -> Dict:
     
     return json_data
 
+
+def generate_order_json(html_file_path: str) -> Dict:
+    """
+    Parse un fichier HTML et génère un JSON
+
+    Args:
+        html_file_path: Chemin vers le fichier HTML
+
+    Returns:
+        Dictionnaire JSON (voir generate_order_json_from_content)
+    """
+    return generate_order_json_from_content(
+        read_html(html_file_path), html_file_path.split('/')[-1]
+    )
+
+
+def parse_many(html_file_paths: List[str]) -> List[Dict]:
+    """
+    Parse un lot de fichiers HTML en parallèle
+
+    Le parsing est purement CPU (arbre BeautifulSoup + regex) sans état
+    partagé, donc on répartit les fichiers sur tous les coeurs.
+    chunksize amortit le coût de pickling des petits dicts résultats.
+
+    Args:
+        html_file_paths: Liste des chemins vers les fichiers HTML
+
+    Returns:
+        Liste des dictionnaires JSON (même ordre que les chemins)
+    """
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        return list(executor.map(generate_order_json, html_file_paths, chunksize=16))